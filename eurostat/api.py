@@ -1,9 +1,11 @@
+import asyncio
+import glob
 import uuid
 from fastapi import FastAPI, HTTPException
 from fastapi import FastAPI, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import os
-import json
+import orjson
 import pandas as pd
 from pydantic import BaseModel
 from starlette.middleware.cors import CORSMiddleware
@@ -21,10 +23,27 @@ app.add_middleware(
     allow_headers=["*"],  # Permetti tutti gli headers
 )
 
-# Inizializza l'oggetto EurostatAPI
+# Inizializza l'oggetto EurostatAPI, condiviso da tutti gli endpoint
 eurostat_api = EurostatAPI()
 
 
+@app.on_event("startup")
+async def startup():
+    # Sessione HTTP condivisa: riutilizza le connessioni keep-alive verso Eurostat
+    app.state.http = EurostatAPI.create_session()
+    eurostat_api.session = app.state.http
+
+    # Carica in memoria i file di descrizione e avvia il controllo periodico delle modifiche
+    refresh_descriptions()
+    app.state.descriptions_watcher = asyncio.create_task(_watch_descriptions())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.descriptions_watcher.cancel()
+    await app.state.http.close()
+
+
 # Modello per la richiesta di filtraggio
 class GenerateDataRequest(BaseModel):
     dataset_id: Optional[str] = None
@@ -34,28 +53,97 @@ class GenerateDataRequest(BaseModel):
     indicators: Optional[List[str]] = None
 
 
-# Percorsi dei file JSON
-IT_FILE_PATH = "extra_data/params_descriptions/indicators-it.json"
-EN_FILE_PATH = "extra_data/params_descriptions/indicators-en.json"
+# Modello per la richiesta di generazione di più dataset in un'unica chiamata
+class BatchGenerateDataRequest(BaseModel):
+    requests: List[GenerateDataRequest]
 
 
-# Funzione per caricare i dati dal file JSON
-def load_indicators(language: str):
-    if language == "it":
-        file_path = IT_FILE_PATH
-    elif language == "en":
-        file_path = EN_FILE_PATH
-    else:
+# Directory in cui si trovano i file di descrizione ({blocco}-{lingua}.json)
+DESCRIPTIONS_DIR = "extra_data/params_descriptions/"
+
+# Intervallo (in secondi) tra due controlli delle modifiche ai file di descrizione
+CACHE_TTL = 60
+
+# Descrizioni caricate in memoria: (blocco, lingua) -> contenuto del file
+DESCRIPTIONS: Dict[Tuple[str, str], Any] = {}
+
+# Lista id/nome/descrizione degli indicatori, precalcolata per lingua
+INDICATORS_DESCRIPTIONS: Dict[str, List[dict]] = {}
+
+# mtime dei file caricati: percorso -> mtime
+_DESCRIPTIONS_MTIMES: Dict[str, float] = {}
+
+
+def _describe_indicators(indicators: List[dict]) -> List[dict]:
+    """
+    Estrae id, nome e descrizione di ogni indicatore.
+    """
+    return [
+        {
+            "id": indicator.get("indicator_id"),
+            "nome": indicator.get("indicator_name"),
+            "descrizione": indicator.get("indicator_description")
+        }
+        for indicator in indicators
+    ]
+
+
+def refresh_descriptions():
+    """
+    Carica in memoria i file di descrizione nuovi o modificati (confrontando l'mtime)
+    e rimuove quelli non più presenti su disco.
+    """
+    found = set()
+    for filepath in glob.glob(os.path.join(DESCRIPTIONS_DIR, "*.json")):
+        blocco, _, lang = os.path.basename(filepath)[:-len(".json")].rpartition("-")
+        if not blocco:
+            continue
+        found.add(filepath)
+        try:
+            mtime = os.stat(filepath).st_mtime
+            if _DESCRIPTIONS_MTIMES.get(filepath) == mtime:
+                continue
+            with open(filepath, "rb") as f:
+                data = orjson.loads(f.read())
+            indicators_descriptions = _describe_indicators(data) if blocco == "indicators" else None
+        except Exception as e:
+            print(f"Errore nel caricamento del file {filepath}: {e}")
+            continue
+
+        DESCRIPTIONS[(blocco, lang)] = data
+        if indicators_descriptions is not None:
+            INDICATORS_DESCRIPTIONS[lang] = indicators_descriptions
+        _DESCRIPTIONS_MTIMES[filepath] = mtime
+
+    for filepath in set(_DESCRIPTIONS_MTIMES) - found:
+        blocco, _, lang = os.path.basename(filepath)[:-len(".json")].rpartition("-")
+        DESCRIPTIONS.pop((blocco, lang), None)
+        if blocco == "indicators":
+            INDICATORS_DESCRIPTIONS.pop(lang, None)
+        del _DESCRIPTIONS_MTIMES[filepath]
+
+
+async def _watch_descriptions():
+    """
+    Ricarica periodicamente i file di descrizione modificati su disco.
+    """
+    while True:
+        await asyncio.sleep(CACHE_TTL)
+        await asyncio.to_thread(refresh_descriptions)
+
+
+def _check_language(language: str):
+    if language not in ("it", "en"):
         raise HTTPException(status_code=400, detail="Lingua non supportata. Utilizzare 'it' o 'en'.")
 
-    try:
-        with open(file_path, "r") as f:
-            indicators = json.load(f)
-        return indicators
-    except FileNotFoundError:
+
+# Funzione per ottenere gli indicatori (id, nome e descrizione) del file JSON caricato
+def load_indicators(language: str):
+    _check_language(language)
+    indicators = INDICATORS_DESCRIPTIONS.get(language)
+    if indicators is None:
         raise HTTPException(status_code=404, detail="File degli indicatori non trovato.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Errore nel caricamento del file: {str(e)}")
+    return indicators
 
 
 # Endpoint per ottenere tutti gli indicatori con nome, descrizione e id
@@ -66,18 +154,7 @@ def get_indicators_descriptions(language: str = "it"):
     :param language: 'it' per italiano, 'en' per inglese.
     :return: Lista di indicatori con campi id, nome e descrizione.
     """
-    indicators = load_indicators(language)
-
-    # Crea una lista di oggetti con campi id, nome e descrizione
-    result = []
-    for indicator in indicators:
-        result.append({
-            "id": indicator.get("indicator_id"),
-            "nome": indicator.get("indicator_name"),
-            "descrizione": indicator.get("indicator_description")
-        })
-
-    return result
+    return load_indicators(language)
 
 
 @app.get("/indicators/")
@@ -85,7 +162,7 @@ async def get_indicators(dataset_id: str = Query(..., description="ID del datase
     """
     Restituisce una lista di indicatori per il dataset scelto.
     """
-    dataset = eurostat_api.get_dataset(dataset_id, format_type='json', cache=False)
+    dataset = await eurostat_api.get_dataset(dataset_id, format_type='json', cache=False)
 
     dataset = {"data": dataset}
 
@@ -100,48 +177,30 @@ async def get_indicators(dataset_id: str = Query(..., description="ID del datase
         return {"error": "Dimensioni non trovate nel dataset"}
 
 
-@app.post("/generate_data/")
-async def generate_data(request: GenerateDataRequest):
-    eurostat = EurostatAPI()
+async def _generate_data(request: GenerateDataRequest):
+    """
+    Scarica e processa il dataset di una singola richiesta, salvando i file in output/output_{_id}.
+    """
     dataset_id = request.dataset_id
     params = {'geo': request.geo, 'unit': request.unit}
-    indicators = request.indicators
-    time_range = request.time_range
 
     _id = str(uuid.uuid4())
 
-    try:
-        os.mkdir(f"../output")
-    except Exception as e:
-        pass
-
-    try:
-        os.mkdir(f"output/output_{_id}")
-    except Exception as e:
-        pass
+    os.makedirs(f"output/output_{_id}", exist_ok=True)
 
-    request_json = json.loads(request.model_dump_json())
+    with open(f"output/output_{_id}/input_request.json", 'wb') as f:
+        f.write(orjson.dumps(request.model_dump(), option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
 
-    with open(f"output/output_{_id}/input_request.json", 'w') as f:
-        json.dump(request_json, f, indent=2)
-
-    dataset = eurostat.get_dataset(dataset_id, params=params, format_type='json', cache=True,
-                                   cache_file=f"output/output_{_id}/raw_data.json")
+    dataset = await eurostat_api.get_dataset(dataset_id, params=params, format_type='json', cache=True,
+                                             cache_file=f"output/output_{_id}/raw_data.json")
     dataset = {"data": dataset}
 
-    # Processare il dataset e salvarlo in JSON e CSV (con delimitatore ';')
-    processed_dataset = eurostat.process_dataset_to_json(dataset, output_dir=f"output/output_{_id}/processed_data", save_separate_tables=True, save_csv=True,
-                                                         csv_delimiter=';')
-
-    for key in processed_dataset:
-        processed_dataset[key] = json.loads(processed_dataset[key])
-
-    if indicators:
-        processed_dataset = {k: v for k, v in processed_dataset.items() if k in indicators}
-
-    if time_range:
-        for key in processed_dataset:
-            processed_dataset[key] = [data for data in processed_dataset[key] if data["time"] in time_range]
+    # Processare il dataset filtrando indicatori e periodi, e salvarlo in JSON e CSV (con delimitatore ';');
+    # l'elaborazione gira in un thread per non bloccare il loop durante le richieste parallele
+    processed_dataset = await asyncio.to_thread(eurostat_api.process_dataset_to_json, dataset,
+                                                output_dir=f"output/output_{_id}/processed_data",
+                                                save_separate_tables=True, save_csv=True, csv_delimiter=';',
+                                                indicators=request.indicators, time_range=request.time_range)
 
     return {
         "_id": _id,
@@ -150,12 +209,28 @@ async def generate_data(request: GenerateDataRequest):
     }
 
 
+@app.post("/generate_data/")
+async def generate_data(request: GenerateDataRequest):
+    return await _generate_data(request)
+
+
+@app.post("/generate_data/batch")
+async def generate_data_batch(body: BatchGenerateDataRequest):
+    """
+    Genera i dati per più richieste in parallelo, condividendo la sessione HTTP.
+    Un errore in una richiesta non interrompe le altre: al suo posto viene restituito {"error": messaggio}.
+    :return: I risultati di /generate_data/ per ogni richiesta, nello stesso ordine.
+    """
+    results = await asyncio.gather(*[_generate_data(request) for request in body.requests], return_exceptions=True)
+    return {"results": [{"error": str(result)} if isinstance(result, Exception) else result for result in results]}
+
+
 @app.get("/dataset/parameters/")
 async def get_dataset_parameters(dataset_id: str = Query(..., description="ID del dataset Eurostat")):
     """
     Restituisce una lista di parametri disponibili (geo, unit, time) per un dataset scelto.
     """
-    dataset = eurostat_api.get_dataset(dataset_id, format_type='json', cache=False)
+    dataset = await eurostat_api.get_dataset(dataset_id, format_type='json', cache=False)
 
     if not dataset:
         return {"error": "Dataset non trovato"}
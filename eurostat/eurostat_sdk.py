@@ -1,12 +1,47 @@
 import os
-import requests
+import numpy as np
 import pandas as pd
-import json
+import orjson
 import time
 import matplotlib.pyplot as plt
 import asyncio
 import aiohttp
-from requests.exceptions import HTTPError, Timeout
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit
+except ImportError:  # numba è opzionale: senza di esso si usa la decodifica NumPy
+    njit = None
+
+
+def _decode_indices_numpy(idx, n_time, n_na_item):
+    """
+    Decodifica gli indici lineari JSON-stat nelle posizioni di time e na_item (versione NumPy).
+    :param idx: Array int64 degli indici delle celle.
+    :param n_time: Numero di etichette della dimensione time.
+    :param n_na_item: Numero di etichette della dimensione na_item.
+    :return: Tuple (time_idx, na_item_idx) di array int64.
+    """
+    return idx % n_time, (idx // n_time) % n_na_item
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _decode_indices(idx, n_time, n_na_item):
+        """
+        Decodifica gli indici lineari JSON-stat nelle posizioni di time e na_item (kernel compilato con numba).
+        Calcola entrambe le posizioni con una sola divisione per cella.
+        """
+        n = idx.shape[0]
+        time_idx = np.empty(n, dtype=np.int64)
+        na_item_idx = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            quotient = idx[i] // n_time
+            time_idx[i] = idx[i] - quotient * n_time
+            na_item_idx[i] = quotient % n_na_item
+        return time_idx, na_item_idx
+else:
+    _decode_indices = _decode_indices_numpy
 
 
 class EurostatAPI:
@@ -14,59 +49,122 @@ class EurostatAPI:
     BASE_URL_SDMX = "https://ec.europa.eu/eurostat/api/dissemination/sdmx/3.0/data/dataflow/"
     BASE_URL_CATALOGUE = "https://ec.europa.eu/eurostat/api/dissemination/catalogue/v2.0/"
 
-    def __init__(self):
-        pass
+    def __init__(self, session=None, max_concurrency=10):
+        """
+        Inizializza il client Eurostat.
+        :param session: aiohttp.ClientSession condivisa per le richieste asincrone.
+                        Se None, ne viene creata una alla prima richiesta.
+        :param max_concurrency: Numero massimo di richieste contemporanee verso Eurostat (default 10).
+        """
+        self.session = session
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    @staticmethod
+    def create_session():
+        """
+        Crea una sessione HTTP con un pool di connessioni keep-alive verso Eurostat,
+        da condividere tra tutte le richieste del processo.
+        :return: Una nuova aiohttp.ClientSession.
+        """
+        connector = aiohttp.TCPConnector(limit=20, limit_per_host=10, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector)
+
+    def _get_session(self):
+        """
+        Restituisce la sessione condivisa, creandola se non ancora disponibile.
+        """
+        if self.session is None or self.session.closed:
+            self.session = self.create_session()
+        return self.session
 
-    def _make_request(self, url, params=None, timeout=10, compressed=True):
+    async def close(self):
+        """
+        Chiude la sessione HTTP, se aperta.
         """
-        Funzione interna per gestire le chiamate API, con gestione degli errori.
-        Gestisce dati compressi (gzip) se richiesto.
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def _make_request(self, url, params=None, timeout=10, compressed=True, cache_entry=None):
+        """
+        Funzione interna per gestire le chiamate API asincrone, con gestione degli errori.
+        Usa la sessione HTTP condivisa e gestisce dati compressi (gzip) se richiesto.
+        Se viene passata una voce di cache con ETag/Last-Modified, la richiesta è condizionale:
+        con una risposta 304 il body non viene scaricato né interpretato.
         :param url: L'URL dell'endpoint API.
         :param params: Parametri opzionali per la query.
-        :param timeout: Timeout per la richiesta (default 10 secondi).
+        :param timeout: Timeout di connessione e lettura (default 10 secondi).
         :param compressed: Se True, invia richieste accettando dati compressi gzip.
-        :return: Risultato della richiesta in formato JSON.
+        :param cache_entry: Voce di cache (come restituita da _load_cache) da rivalidare con il server.
+        :return: Dizionario con 'data', 'etag' e 'last_modified' (la stessa cache_entry se non modificata),
+                 oppure None in caso di errore.
         """
         headers = {}
         if compressed:
             headers['Accept-Encoding'] = 'gzip'
+        if cache_entry is not None:
+            if cache_entry.get('etag'):
+                headers['If-None-Match'] = cache_entry['etag']
+            if cache_entry.get('last_modified'):
+                headers['If-Modified-Since'] = cache_entry['last_modified']
+
+        # aiohttp non accetta parametri con valore None: vengono scartati come faceva requests
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            return response.json()
-        except HTTPError as http_err:
+            session = self._get_session()
+            client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+            # Limita il numero di richieste in volo per evitare errori di connessione o rate-limit
+            async with self._sem:
+                async with session.get(url, params=params, headers=headers, timeout=client_timeout) as response:
+                    if response.status == 304 and cache_entry is not None:
+                        return cache_entry
+                    response.raise_for_status()
+                    return {
+                        'data': orjson.loads(await response.read()),
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified')
+                    }
+        except aiohttp.ClientResponseError as http_err:
             print(f"Errore HTTP: {http_err}")
-        except Timeout as timeout_err:
+        except asyncio.TimeoutError as timeout_err:
             print(f"Timeout: {timeout_err}")
         except Exception as err:
             print(f"Errore generico: {err}")
         return None
 
-    def _cache_response(self, cache_file, data, timeout=3600):
+    def _cache_response(self, cache_file, data, timeout=3600, etag=None, last_modified=None):
         """
-        Salva la risposta in cache.
+        Salva la risposta in cache, insieme agli header per le richieste condizionali.
         :param cache_file: Nome del file di cache.
         :param data: Dati da salvare.
         :param timeout: Timeout per considerare i dati freschi (in secondi).
+        :param etag: Header ETag della risposta.
+        :param last_modified: Header Last-Modified della risposta.
         """
         current_time = time.time()
-        cache_data = {'data': data, 'timestamp': current_time}
-        with open(cache_file, 'w') as f:
-            json.dump(cache_data, f, indent=2)
+        cache_data = {'data': data, 'etag': etag, 'last_modified': last_modified, 'timestamp': current_time}
+        with open(cache_file, 'wb') as f:
+            f.write(orjson.dumps(cache_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
 
     def _load_cache(self, cache_file, timeout=3600):
         """
-        Carica i dati dalla cache se validi.
+        Carica i dati dalla cache.
+        Anche quando il TTL è scaduto la voce viene restituita, per poterla rivalidare con il server.
         :param cache_file: Nome del file di cache.
         :param timeout: Tempo in secondi per considerare i dati validi.
-        :return: Dati in cache se validi, altrimenti None.
+        :return: Dizionario con 'data', 'etag', 'last_modified' e 'fresh' (True se entro il TTL),
+                 oppure None se la cache non esiste.
         """
         if os.path.exists(cache_file):
-            with open(cache_file, 'r') as f:
-                cache_data = json.load(f)
-                if time.time() - cache_data['timestamp'] < timeout:
-                    return cache_data['data']
+            with open(cache_file, 'rb') as f:
+                cache_data = orjson.loads(f.read())
+            return {
+                'data': cache_data['data'],
+                'etag': cache_data.get('etag'),
+                'last_modified': cache_data.get('last_modified'),
+                'fresh': time.time() - cache_data['timestamp'] < timeout
+            }
         return None
 
     def _explore_json(self, dataset_json):
@@ -74,9 +172,9 @@ class EurostatAPI:
         Esplora il JSON ricevuto dall'API per determinare la struttura.
         :param dataset_json: Dataset JSON ricevuto dall'API.
         """
-        print(json.dumps(dataset_json, indent=4))  # Stampa il JSON in modo leggibile
+        print(orjson.dumps(dataset_json, option=orjson.OPT_INDENT_2).decode())  # Stampa il JSON in modo leggibile
 
-    def get_dataset(self, dataset_id, params=None, format_type='json', cache=False, cache_file="cache.json"):
+    async def get_dataset(self, dataset_id, params=None, format_type='json', cache=False, cache_file="cache.json"):
         """
         Scarica un dataset specifico da Eurostat in formato JSON-stat o SDMX.
         :param dataset_id: ID del dataset Eurostat (es. 'nama_10_gdp').
@@ -86,11 +184,12 @@ class EurostatAPI:
         :param cache_file: Nome del file di cache.
         :return: Dataset in formato JSON o XML.
         """
+        cache_entry = None
         if cache:
-            cached_data = self._load_cache(cache_file)
-            if cached_data:
+            cache_entry = self._load_cache(cache_file)
+            if cache_entry is not None and cache_entry['fresh'] and cache_entry['data']:
                 print(f"Caricato da cache {cache_file}")
-                return cached_data
+                return cache_entry['data']
 
         if format_type == 'json':
             url = f"{self.BASE_URL_JSON}{dataset_id}"
@@ -99,18 +198,24 @@ class EurostatAPI:
         else:
             raise ValueError(f"Formato {format_type} non supportato.")
 
-        dataset = self._make_request(url, params=params)
+        response = await self._make_request(url, params=params, cache_entry=cache_entry)
+        dataset = response['data'] if response is not None else None
         if dataset:
-            print(f"Dataset '{dataset_id}' scaricato con successo!")
+            if response is cache_entry:
+                print(f"Dataset '{dataset_id}' non modificato, caricato da cache {cache_file}")
+            else:
+                print(f"Dataset '{dataset_id}' scaricato con successo!")
             if cache:
-                self._cache_response(cache_file, dataset)
+                # Rinnova il timestamp (e gli header di validazione) della voce in cache
+                self._cache_response(cache_file, dataset, etag=response['etag'],
+                                     last_modified=response['last_modified'])
             return dataset
         else:
             print(f"Errore: Impossibile scaricare il dataset {dataset_id}")
             return None
 
     def process_dataset_to_json(self, dataset_json, output_dir="output", save_separate_tables=False, save_csv=False,
-                                csv_delimiter=","):
+                                csv_delimiter=",", indicators=None, time_range=None):
         """
         Funzione per processare un dataset in formato JSON e generare una rappresentazione per ogni indicatore.
         Salva i risultati finali in un file JSON e, opzionalmente, salva ogni tabella come file JSON e/o CSV separato.
@@ -120,7 +225,9 @@ class EurostatAPI:
         :param save_separate_tables: Se True, salva ogni tabella separatamente come file JSON (default: False)
         :param save_csv: Se True, salva ogni tabella separatamente come file CSV (default: False)
         :param csv_delimiter: Delimitatore da utilizzare nei file CSV (default: ',')
-        :return: None
+        :param indicators: Lista opzionale di indicatori (etichette na_item) da mantenere; se None li mantiene tutti
+        :param time_range: Lista opzionale di periodi (etichette time) da mantenere; se None li mantiene tutti
+        :return: Un dizionario indicatore -> lista di record (time, geo, unit, value)
         """
         # Creare la directory di output se non esiste
         if not os.path.exists(output_dir):
@@ -131,125 +238,150 @@ class EurostatAPI:
             print("La chiave 'dimension' esiste nel dataset.")
 
             # Estrarre le etichette delle dimensioni
-            time_labels = dataset_json['data']['dimension']['time']['category']['label']
-            na_item_labels = dataset_json['data']['dimension']['na_item']['category']['label']
-            geo_labels = dataset_json['data']['dimension']['geo']['category']['label']
-            unit_labels = dataset_json['data']['dimension']['unit']['category']['label']
-
-            # Dizionario per contenere i DataFrame per ogni indicatore
-            indicator_dfs = {}
-
-            # Estrarre i valori effettivi
+            dimension = dataset_json['data']['dimension']
+            time_labels = dimension['time']['category']['label']
+            na_item_labels = dimension['na_item']['category']['label']
+            geo_labels = dimension['geo']['category']['label']
+            unit_labels = dimension['unit']['category']['label']
+
+            # Etichette in ordine di posizione, calcolate una sola volta per decodificare gli indici in blocco
+            time_names = np.array(list(time_labels.values()), dtype=object)
+            na_item_names = np.array(list(na_item_labels.values()), dtype=object)
+            n_time = len(time_names)
+            n_na_item = len(na_item_names)
+
+            # Il geo e l'unit sono quelli della query: si usa la prima chiave disponibile
+            geo = next(iter(geo_labels))
+            unit = next(iter(unit_labels))
+
+            # Estrarre i valori effettivi direttamente in array preallocati, senza liste intermedie
             values = dataset_json['data']['value']
-
-            # Creare un DataFrame per le dimensioni
-            data = []
-            for value_key, value in values.items():
-                idx = int(value_key)
-
-                # Modifica del calcolo degli indici per garantire che siano mappati correttamente
-                time_key = list(time_labels.keys())[idx % len(time_labels)]
-                na_item_key = list(na_item_labels.keys())[(idx // len(time_labels)) % len(na_item_labels)]
-
-                # Verificare che le chiavi calcolate siano presenti
-                if time_key in time_labels:
-                    time = time_labels[time_key]
-                else:
-                    print(f"Chiave {time_key} non trovata in time_labels")
-                    continue
-
-                if na_item_key in na_item_labels:
-                    na_item = na_item_labels[na_item_key]
-                else:
-                    print(f"Chiave {na_item_key} non trovata in na_item_labels")
-                    continue
-
-                # Cerca il valore del geo e dell'unit utilizzando le chiavi fornite dall'utente, con un fallback a 'Unknown Geo' e 'Unknown Unit'
-                geo = list(geo_labels.keys())[0]
-                unit = list(unit_labels.keys())[0]
-
-                # Aggiungere i dati per il DataFrame
-                data.append({
-                    'time': time,
-                    'geo': geo,
-                    'unit': unit,
-                    'value': value
-                })
-
-                # Se l'indicatore non è già presente nel dizionario, creiamo una lista per esso
-                if na_item not in indicator_dfs:
-                    indicator_dfs[na_item] = []
-
-                # Aggiungere la riga per questo indicatore
-                indicator_dfs[na_item].append({
-                    'time': time,
-                    'geo': geo,
-                    'unit': unit,
-                    'value': value
-                })
-
-            # Convertire i dati dei singoli indicatori in DataFrame e poi in formato JSON o CSV
+            idx = np.fromiter(values.keys(), dtype=np.int64, count=len(values))
+            # I valori restano oggetti Python: interi e celle nulle (None) vengono emessi così come arrivano
+            vals = np.array(list(values.values()), dtype=object)
+
+            # Decodifica vettoriale degli indici JSON-stat (il tempo è la dimensione più interna)
+            time_idx, na_item_idx = _decode_indices(idx, n_time, n_na_item)
+
+            # Applicare i filtri durante la costruzione: la maschera si calcola sulle etichette e si applica in blocco
+            keep = None
+            if indicators:
+                indicators = set(indicators)
+                keep = np.fromiter((name in indicators for name in na_item_names), dtype=bool,
+                                   count=n_na_item)[na_item_idx]
+            if time_range:
+                time_range = set(time_range)
+                time_keep = np.fromiter((name in time_range for name in time_names), dtype=bool,
+                                        count=n_time)[time_idx]
+                keep = time_keep if keep is None else keep & time_keep
+            if keep is not None:
+                time_idx, na_item_idx, vals = time_idx[keep], na_item_idx[keep], vals[keep]
+
+            # Raggruppare le celle per indicatore senza passare da un DataFrame: un ordinamento stabile
+            # per etichetta porta le celle di ogni indicatore in un intervallo contiguo
+            indicator_names, indicator_ids = np.unique(na_item_names, return_inverse=True)
+            cell_indicators = indicator_ids[na_item_idx]
+            order = np.argsort(cell_indicators, kind='stable')
+            sorted_indicators = cell_indicators[order]
+            sorted_times = time_names[time_idx[order]].tolist()
+            sorted_vals = vals[order].tolist()
+
+            # Gli indicatori vengono emessi nell'ordine di prima apparizione nel dataset
+            present, first_cell = np.unique(cell_indicators, return_index=True)
+            present = present[np.argsort(first_cell)]
+            starts = np.searchsorted(sorted_indicators, present, side='left')
+            ends = np.searchsorted(sorted_indicators, present, side='right')
+
+            # Generare le tabelle in JSON o CSV; i file vengono preparati in memoria
+            # e scritti tutti insieme alla fine, in parallelo
             json_result = {}
-            for indicator, records in indicator_dfs.items():
-                df = pd.DataFrame(records)
-                json_result[indicator] = df.to_json(orient='records')  # Convertire il DataFrame in JSON
+            pending_writes = []
+            for indicator_id, start, end in zip(present.tolist(), starts.tolist(), ends.tolist()):
+                indicator = indicator_names[indicator_id]
+                records = [
+                    {'time': time, 'geo': geo, 'unit': unit, 'value': value}
+                    for time, value in zip(sorted_times[start:end], sorted_vals[start:end])
+                ]
+                json_result[indicator] = records
 
                 # Se richiesto, salva ogni tabella separatamente in JSON
                 if save_separate_tables:
                     output_table_path = os.path.join(output_dir, f"{indicator.replace(' ', '_')}.json")
-                    with open(output_table_path, 'w', encoding='utf-8') as table_file:
-                        json.dump(json.loads(json_result[indicator]), table_file, indent=4)
-                    print(f"Tabella JSON salvata per {indicator}: {output_table_path}")
+                    pending_writes.append((output_table_path, orjson.dumps(records, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS),
+                                           f"Tabella JSON salvata per {indicator}: {output_table_path}"))
 
                 # Se richiesto, salva ogni tabella separatamente in CSV
                 if save_csv:
                     output_csv_path = os.path.join(output_dir, f"{indicator.replace(' ', '_')}.csv")
-                    df.to_csv(output_csv_path, sep=csv_delimiter, index=False)
-                    print(f"Tabella CSV salvata per {indicator}: {output_csv_path}")
+                    table = pd.DataFrame(records)  # Il DataFrame serve solo per generare il CSV
+                    pending_writes.append((output_csv_path, table.to_csv(sep=csv_delimiter, index=False).encode('utf-8'),
+                                           f"Tabella CSV salvata per {indicator}: {output_csv_path}"))
 
             # Salva il JSON finale contenente tutte le tabelle
             output_json_path = os.path.join(output_dir, "final_output.json")
-            with open(output_json_path, 'w', encoding='utf-8') as output_file:
-                json.dump(json_result, output_file, indent=4)
-            print(f"Output JSON finale salvato in: {output_json_path}")
+            pending_writes.append((output_json_path, orjson.dumps(json_result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS),
+                                   f"Output JSON finale salvato in: {output_json_path}"))
+
+            self._write_files(pending_writes)
             return json_result
 
         else:
             print("La chiave 'dimension' non esiste nel dataset.")
 
-    async def _make_async_request(self, url, params=None, timeout=10):
+    @staticmethod
+    def _write_files(pending_writes, max_workers=8):
         """
-        Effettua una richiesta asincrona.
-        :param url: L'URL dell'endpoint API.
-        :param params: Parametri opzionali per la query.
-        :param timeout: Timeout per la richiesta (default 10 secondi).
-        :return: Risultato della richiesta in formato JSON.
+        Scrive su disco più file in parallelo, sovrapponendo le operazioni di I/O.
+        :param pending_writes: Lista di tuple (percorso, contenuto in bytes, messaggio da stampare a scrittura completata).
+        :param max_workers: Numero massimo di thread di scrittura.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, timeout=timeout) as response:
-                return await response.json()
+        def write(item):
+            path, data, _ = item
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Consumare i risultati fa propagare eventuali errori di scrittura
+            list(executor.map(write, pending_writes))
+        for _, _, message in pending_writes:
+            print(message)
 
     async def get_dataset_async(self, dataset_id, params=None):
         """
         Scarica un dataset in modo asincrono.
+        Mantenuto per compatibilità: equivale a get_dataset con i parametri di default.
         :param dataset_id: ID del dataset.
         :param params: Parametri di query.
         """
-        url = f"{self.BASE_URL_JSON}{dataset_id}"
-        return await self._make_async_request(url, params=params)
+        return await self.get_dataset(dataset_id, params=params)
+
+    async def get_datasets(self, dataset_ids, params=None):
+        """
+        Scarica più dataset in parallelo; le richieste in volo restano limitate dal semaforo del client.
+        :param dataset_ids: Lista di ID dei dataset.
+        :param params: Parametri di query comuni a tutti i dataset.
+        :return: Lista dei dataset scaricati, nello stesso ordine degli ID (None per quelli non disponibili).
+        """
+        return await asyncio.gather(*[self.get_dataset(dataset_id, params=params) for dataset_id in dataset_ids])
 
 
 # Esempio di utilizzo dell'SDK e funzioni
 if __name__ == "__main__":
-    eurostat = EurostatAPI()
+    async def main():
+        eurostat = EurostatAPI()
+
+        dataset_id = "nama_10_gdp"
+        params = {'geo': 'IT', 'unit': 'CP_MEUR'}
 
-    dataset_id = "nama_10_gdp"
-    params = {'geo': 'IT', 'unit': 'CP_MEUR'}
+        try:
+            dataset = await eurostat.get_dataset(dataset_id, params=params, format_type='json', cache=True,
+                                                 cache_file="gdp_cache.json")
+        finally:
+            await eurostat.close()
+        dataset = {"data": dataset}
 
-    dataset = eurostat.get_dataset(dataset_id, params=params, format_type='json', cache=True,
-                                   cache_file="gdp_cache.json")
-    dataset = {"data": dataset}
+        # Processare il dataset e salvarlo in JSON e CSV (con delimitatore ';')
+        eurostat.process_dataset_to_json(dataset, output_dir="output", save_separate_tables=True, save_csv=True,
+                                         csv_delimiter=';')
 
-    # Processare il dataset e salvarlo in JSON e CSV (con delimitatore ';')
-    eurostat.process_dataset_to_json(dataset, output_dir="output", save_separate_tables=True, save_csv=True,
-                                     csv_delimiter=';')
+    asyncio.run(main())
@@ -1,14 +1,16 @@
-import json
+import asyncio
+import glob
 import os
 
+import orjson
 import uvicorn
 from fastapi import FastAPI, Query, HTTPException
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import random
 from pydantic import BaseModel
 from starlette.middleware.cors import CORSMiddleware
 
-from yahoo_finance_sdk import get_tickers, generate_data, GenerateDataRequest  # Importa le tue funzioni e classi
+from yahoo_finance_sdk import get_tickers, _load_tickers, generate_data, GenerateDataRequest, InvalidRequestError  # Importa le tue funzioni e classi
 
 # Crea un'app FastAPI
 app = FastAPI()
@@ -22,25 +24,111 @@ app.add_middleware(
     allow_headers=["*"],  # Permetti tutti gli headers
 )
 
+# Modello per la richiesta dei dati di più ticker in un'unica chiamata
+class BatchGenerateDataRequest(BaseModel):
+    requests: List[GenerateDataRequest]
+
+
 # Directory in cui si trovano i file di descrizione
 DESCRIPTIONS_DIR = "extra_data/params_descriptions/"
 
+# Intervallo (in secondi) tra due controlli delle modifiche ai file di descrizione
+CACHE_TTL = 60
+
+# Descrizioni caricate in memoria: (blocco, lingua) -> contenuto del file
+DESCRIPTIONS: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+# mtime dei file caricati: percorso -> mtime
+_DESCRIPTIONS_MTIMES: Dict[str, float] = {}
+
+# File dei tickers servito da /tickers e mtime dell'ultima versione caricata
+TICKERS_FILE = "tickers_data.json"
+_TICKERS_MTIME: Optional[float] = None
+
+
+def refresh_descriptions():
+    """
+    Carica in memoria i file di descrizione nuovi o modificati (confrontando l'mtime)
+    e rimuove quelli non più presenti su disco.
+    """
+    found = set()
+    for filepath in glob.glob(os.path.join(DESCRIPTIONS_DIR, "*.json")):
+        blocco, _, lang = os.path.basename(filepath)[:-len(".json")].rpartition("-")
+        if not blocco:
+            continue
+        found.add(filepath)
+        try:
+            mtime = os.stat(filepath).st_mtime
+            if _DESCRIPTIONS_MTIMES.get(filepath) == mtime:
+                continue
+            with open(filepath, "rb") as f:
+                DESCRIPTIONS[(blocco, lang)] = orjson.loads(f.read())
+        except Exception as e:
+            print(f"Errore nel caricamento del file {filepath}: {e}")
+            continue
+        _DESCRIPTIONS_MTIMES[filepath] = mtime
+
+    for filepath in set(_DESCRIPTIONS_MTIMES) - found:
+        blocco, _, lang = os.path.basename(filepath)[:-len(".json")].rpartition("-")
+        DESCRIPTIONS.pop((blocco, lang), None)
+        del _DESCRIPTIONS_MTIMES[filepath]
+
+
+def refresh_tickers():
+    """
+    Ricarica in app.state.tickers il file dei tickers, solo se è stato modificato dall'ultimo caricamento.
+    """
+    global _TICKERS_MTIME
+    try:
+        mtime = os.stat(TICKERS_FILE).st_mtime
+    except OSError as e:
+        print(f"Errore nel caricamento del file {TICKERS_FILE}: {e}")
+        return
+    if mtime == _TICKERS_MTIME:
+        return
+    try:
+        tickers = _load_tickers(TICKERS_FILE, mtime)
+    except Exception as e:
+        # In caso di file non valido (es. scrittura in corso) si mantiene la lista precedente e,
+        # non aggiornando _TICKERS_MTIME, il caricamento viene ritentato al controllo successivo
+        print(f"Errore nel caricamento del file {TICKERS_FILE}: {e}")
+        return
+    app.state.tickers = tickers
+    _TICKERS_MTIME = mtime
+
+
+async def _watch_descriptions():
+    """
+    Ricarica periodicamente i file di descrizione e dei tickers modificati su disco.
+    """
+    while True:
+        await asyncio.sleep(CACHE_TTL)
+        await asyncio.to_thread(refresh_descriptions)
+        await asyncio.to_thread(refresh_tickers)
+
+
+@app.on_event("startup")
+async def startup():
+    # Carica in memoria i file di descrizione e dei tickers e avvia il controllo periodico delle modifiche
+    app.state.tickers = []
+    refresh_descriptions()
+    refresh_tickers()
+    app.state.descriptions_watcher = asyncio.create_task(_watch_descriptions())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.descriptions_watcher.cancel()
+
 
 def load_descriptions(blocco: str) -> Dict[str, Dict[str, str]]:
     """
-    Carica le descrizioni dei parametri per un blocco specifico.
+    Restituisce le descrizioni dei parametri per un blocco specifico, già caricate in memoria.
 
     :param blocco: Nome del blocco (esg_data, financials_data, etc.).
     :return: Un dizionario contenente le descrizioni in diverse lingue.
     """
-    descriptions = {}
-    for lang in ["it", "en"]:  # Si cercano i file per italiano e inglese
-        filepath = os.path.join(DESCRIPTIONS_DIR, f"{blocco}-{lang}.json")
-        if os.path.exists(filepath):
-            with open(filepath, "r", encoding="utf-8") as f:
-                descriptions[lang] = json.load(f)
-        else:
-            descriptions[lang] = {}
+    descriptions = {lang: DESCRIPTIONS.get((blocco, lang), {}) for lang in ["it", "en"]}
 
     if not descriptions["it"] and not descriptions["en"]:
         raise FileNotFoundError(f"Descrizioni non trovate per il blocco {blocco}.")
@@ -69,26 +157,26 @@ async def get_descriptions(
         # Restituisci tutte le descrizioni
         return descriptions
 
-    filtered_descriptions = {"it": {}, "en": {}}
-
-    for param in params:
-        for lang in ["it", "en"]:
-            if param in descriptions[lang]:
-                filtered_descriptions[lang][param] = descriptions[lang][param]
-            else:
-                filtered_descriptions[lang][param] = "Descrizione non disponibile."
+    # Un solo accesso al dizionario per parametro, con il valore di default per quelli mancanti
+    filtered_descriptions = {
+        lang: {param: descriptions[lang].get(param, "Descrizione non disponibile.") for param in params}
+        for lang in ["it", "en"]
+    }
 
     return filtered_descriptions
 
 
 # Endpoint 1: Get tickers
 @app.get("/tickers", response_model=List[Dict[str, Any]])
-async def tickers(file_path: str = "tickers_data.json"):
+async def tickers(file_path: str = TICKERS_FILE):
     """
     Ottiene tutti i tickers dal file JSON specificato.
+    Il file di default è già caricato in memoria all'avvio; gli altri file vengono letti a ogni richiesta.
     :param file_path: Percorso del file JSON contenente i dati dei tickers.
     :return: Lista di dizionari con ticker, company_name, sector, market_cap.
     """
+    if file_path == TICKERS_FILE:
+        return app.state.tickers
     try:
         tickers_data = get_tickers(file_path)
         return tickers_data
@@ -105,19 +193,35 @@ async def filter_tickers(...)
 
 
 # Endpoint 3: Get data by ticker
-@app.post("/tickers/{ticker}/data", response_model=Dict[str, Any])
+@app.post("/tickers/{ticker}/data", response_model=Any)
 async def data_by_ticker(request: GenerateDataRequest):
     """
     Ottiene i dati per un ticker specifico.
 
-    :return: Dati per il ticker specifico.
+    :return: Dati per il ticker specifico, oppure il messaggio dell'SDK se i dati non sono disponibili.
     """
     try:
         output_data = generate_data(request)
         return output_data
+    except InvalidRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+# Endpoint 3 (batch): Get data for multiple tickers
+@app.post("/tickers/data/batch", response_model=Dict[str, Any])
+async def data_by_tickers(body: BatchGenerateDataRequest):
+    """
+    Ottiene i dati per più ticker in parallelo.
+    Un errore in una richiesta non interrompe le altre: al suo posto viene restituito {"error": messaggio}.
+
+    :return: I dati di ogni richiesta, nello stesso ordine delle richieste.
+    """
+    results = await asyncio.gather(*[asyncio.to_thread(generate_data, request) for request in body.requests],
+                                   return_exceptions=True)
+    return {"results": [{"error": str(result)} if isinstance(result, Exception) else result for result in results]}
+
 '''
 # Endpoint 4: Filter data
 @app.get("/tickers/data/filter", response_model=List[Dict[str, Any]])
@@ -1,4 +1,4 @@
-import json
+import orjson
 from typing import List, Dict
 
 
@@ -13,34 +13,31 @@ def extract_data_from_file(file_path):
     data_list = []
 
     try:
-        # Apri e leggi il file di testo
+        # Apri il file di testo e processa una riga alla volta, senza caricarle tutte in memoria
         with open(file_path, 'r') as file:
-            lines = file.readlines()
-
-        # Processa ogni riga e estrae i campi necessari
-        for line in lines:
-            # Divide la riga in base ai tabulatori
-            line_parts = line.split('\t')
-
-            # Assicurati che la riga abbia almeno 5 elementi (ticker, nome, settore, market cap, entrate)
-            if len(line_parts) >= 5:
-                ticker = line_parts[0].strip()  # Ticker
-                company_name = line_parts[1].strip()  # Nome dell'azienda
-                sector = line_parts[2].strip()  # Settore
-                market_cap = line_parts[3].strip()  # Capitalizzazione di mercato
-                revenue = line_parts[4].strip()  # Entrate
-
-                # Crea un dizionario con i dati estratti
-                company_data = {
-                    "ticker": ticker,
-                    "company_name": company_name,
-                    "sector": sector,
-                    "market_cap": market_cap,
-                    "revenue": revenue
-                }
-
-                # Aggiungi il dizionario alla lista
-                data_list.append(company_data)
+            for line in file:
+                # Divide la riga in base ai tabulatori
+                line_parts = line.split('\t')
+
+                # Assicurati che la riga abbia almeno 5 elementi (ticker, nome, settore, market cap, entrate)
+                if len(line_parts) >= 5:
+                    ticker = line_parts[0].strip()  # Ticker
+                    company_name = line_parts[1].strip()  # Nome dell'azienda
+                    sector = line_parts[2].strip()  # Settore
+                    market_cap = line_parts[3].strip()  # Capitalizzazione di mercato
+                    revenue = line_parts[4].strip()  # Entrate
+
+                    # Crea un dizionario con i dati estratti
+                    company_data = {
+                        "ticker": ticker,
+                        "company_name": company_name,
+                        "sector": sector,
+                        "market_cap": market_cap,
+                        "revenue": revenue
+                    }
+
+                    # Aggiungi il dizionario alla lista
+                    data_list.append(company_data)
 
         return data_list
 
@@ -61,8 +58,8 @@ def get_tickers(file_path: str = "tickers_data.json") -> List[Dict[str, str]]:
     """
     try:
         # Leggi il file JSON e carica i dati
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
 
         # Estrai i campi ticker, company_name, sector e market_cap
         extracted_data = [
@@ -81,7 +78,7 @@ def get_tickers(file_path: str = "tickers_data.json") -> List[Dict[str, str]]:
         print(f"Errore: File non trovato - {file_path}")
         return []
 
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print(f"Errore: Formato JSON non valido - {file_path}")
         return []
 
@@ -97,13 +94,13 @@ if __name__ == "__main__":
 
     if data:
         # Stampa i dati in formato JSON
-        print(json.dumps(data, indent=4))
+        print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
 
         # Salva l'output JSON in un file
         output_file_path = "tickers_data.json"
         try:
-            with open(output_file_path, 'w') as json_file:
-                json.dump(data, json_file, indent=4)
+            with open(output_file_path, 'wb') as json_file:
+                json_file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             print(f"Dati salvati correttamente in {output_file_path}")
         except Exception as e:
             print(f"Errore durante il salvataggio del file JSON: {e}")
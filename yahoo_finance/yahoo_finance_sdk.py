@@ -1,17 +1,119 @@
-import json
+import logging
 import os
 import random
-from typing import Optional, List, Dict, Any, Literal
-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import suppress
+from functools import lru_cache
+from typing import List, Dict, Any, Union
+
+import ijson
+import orjson
+import requests
+import requests_cache
 import yfinance as yf
 import pandas as pd
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+logger = logging.getLogger(__name__)
+
+# Errori attesi nel recupero dei dati da Yahoo Finance (rete, risposte vuote o non valide, campi mancanti,
+# ticker non inizializzato): vengono restituiti come messaggio, mentre gli altri errori vengono propagati
+_FETCH_ERRORS = (requests.RequestException, yf.exceptions.YFException, KeyError, AttributeError)
+
+
+class InvalidRequestError(ValueError):
+    """Richiesta non valida (data_id non ammesso o uso non supportato di una lista di ticker)."""
 
 
 class GenerateDataRequest(BaseModel):
-    ticker: Optional[str] = "AAPL"
-    data_id: Optional[Literal["esg_data", "company_data", "financials_data", "dividends_data", "stock_history"]] = "esg_data"
-    data_params: Optional[Dict[str, Any]] = {}
+    model_config = ConfigDict(extra='ignore')
+
+    ticker: Union[str, List[str]] = "AAPL"
+    # Valori ammessi: le chiavi di _DISPATCH (verificati in generate_data)
+    data_id: str = "esg_data"
+    data_params: Dict[str, Any] = {}
+
+
+@lru_cache(maxsize=512)
+def _get_ticker(ticker: str, session: requests.Session, period: int) -> yf.Ticker:
+    """
+    Restituisce l'oggetto yf.Ticker per il simbolo indicato, condiviso tra le chiamate successive
+    così da riutilizzare i dati già scaricati da yfinance.
+    yfinance conserva sull'oggetto i dati già letti (info, sustainability, bilanci): il periodo
+    (vedi ESGDataFetcher._cache_period) fa parte della chiave, così alla scadenza viene creato un nuovo oggetto.
+    """
+    return yf.Ticker(ticker, session=session)
+
+
+def _atomic_write(filepath: str, writer) -> None:
+    """
+    Scrive un file in modo atomico: writer(percorso) scrive un file temporaneo accanto alla destinazione,
+    che sostituisce poi il file finale con os.replace. In caso di errore il file finale resta invariato.
+
+    :param filepath: Percorso del file da scrivere.
+    :param writer: Funzione che riceve il percorso del file temporaneo e vi scrive i dati.
+    """
+    # Nome temporaneo distinto per processo e thread, così scritture concorrenti dello stesso file non si mescolano
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        writer(tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_bytes_atomic(filepath: str, data: bytes) -> None:
+    """
+    Scrive dei byte in un file in modo atomico, con un buffer di scrittura da 1 MiB.
+    """
+    def write(tmp_path):
+        with open(tmp_path, 'wb', buffering=1 << 20) as f:
+            f.write(data)
+
+    _atomic_write(filepath, write)
+
+
+def _json_keys(index: pd.Index) -> List[str]:
+    """
+    Converte le etichette di un indice in chiavi JSON, come fa pandas con to_json:
+    le date diventano timestamp epoch in millisecondi.
+    """
+    if isinstance(index, pd.DatetimeIndex):
+        return [str(key) for key in index.as_unit('ms').asi8.tolist()]
+    return [str(key) for key in index]
+
+
+def _json_values(series: pd.Series) -> List[Any]:
+    """
+    Converte i valori di una Series in oggetti Python serializzabili, con None per i valori mancanti.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        series = series.dt.as_unit('ms').astype('int64').astype(object).where(series.notna(), None)
+        return series.tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _dataframe_to_payload(data) -> Dict[str, Any]:
+    """
+    Converte una Series o un DataFrame nella stessa struttura di to_json(orient='columns'):
+    {indice: valore} per una Series, {colonna: {indice: valore}} per un DataFrame.
+
+    :param data: Series o DataFrame da convertire.
+    :return: Un dizionario pronto per essere serializzato con orjson.
+    """
+    if isinstance(data, pd.Series):
+        return dict(zip(_json_keys(data.index), _json_values(data)))
+    if isinstance(data, pd.DataFrame):
+        index_keys = _json_keys(data.index)
+        return {
+            column: dict(zip(index_keys, _json_values(data.iloc[:, position])))
+            for position, column in enumerate(_json_keys(data.columns))
+        }
+    raise TypeError(f"tipo {type(data).__name__} non convertibile in JSON")
 
 
 class ESGDataFetcher:
@@ -20,6 +122,15 @@ class ESGDataFetcher:
     bilanci e altre metriche finanziarie, utilizzando yfinance.
     """
 
+    # Validità (in secondi) dei file JSON già salvati per i dati ESG e le informazioni aziendali
+    CACHE_TTL = 24 * 60 * 60
+
+    # Validità (in secondi) dei file Parquet con la storia dei prezzi e dei dividendi
+    HISTORY_CACHE_TTL = 60 * 60
+
+    # Sessione HTTP con cache su SQLite, condivisa da tutte le istanze (creata al primo utilizzo)
+    _session = None
+
     def __init__(self, ticker, output_dir="output"):
         """
         Inizializza la classe con il ticker dell'azienda e la directory di output.
@@ -28,22 +139,40 @@ class ESGDataFetcher:
         :param output_dir: Directory in cui salvare i file JSON.
         """
         self.ticker = ticker
-        self.output_dir = "/".join([output_dir, self.ticker])
+        self.output_dir = os.path.join(output_dir, self.ticker)
         self.company = None
         self.fetch_company_data()
 
         # Crea la directory se non esiste
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    @classmethod
+    def _get_session(cls):
+        """
+        Restituisce la sessione HTTP condivisa, che memorizza per un'ora le risposte di Yahoo Finance
+        così che le richieste ripetute non passino dalla rete.
+        """
+        if cls._session is None:
+            cls._session = requests_cache.CachedSession('yf_cache', backend='sqlite', expire_after=3600)
+        return cls._session
+
+    @classmethod
+    def _cache_period(cls):
+        """
+        Restituisce l'indice dell'intervallo di CACHE_TTL secondi corrente, usato per far scadere gli oggetti
+        condivisi in memoria: un file salvato scade sempre in un intervallo successivo a quello in cui è stato scritto,
+        quindi viene rigenerato con dati scaricati di nuovo.
+        """
+        return int(time.time() // cls.CACHE_TTL)
 
     def fetch_company_data(self):
         """
         Ottiene i dati aziendali usando yfinance.
         """
         try:
-            self.company = yf.Ticker(self.ticker)
+            self.company = _get_ticker(self.ticker, self._get_session(), self._cache_period())
         except Exception as e:
-            print(f"Errore nel recupero dei dati per {self.ticker}: {e}")
+            logger.error("Errore nel recupero dei dati per %s: %s", self.ticker, e)
 
     def save_json(self, data, filename):
         """
@@ -51,17 +180,20 @@ class ESGDataFetcher:
 
         :param data: I dati da salvare.
         :param filename: Nome del file in cui salvare i dati.
+        :return: Il contenuto del file JSON salvato, oppure None in caso di errore.
         """
         filepath = os.path.join(self.output_dir, filename)
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=4)
-            print(f"Dati salvati in {filepath}")
+            encoded = orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+                                   | orjson.OPT_NON_STR_KEYS)
+            _write_bytes_atomic(filepath, encoded)
+            logger.debug("Dati salvati in %s", filepath)
         except Exception as e:
-            print(f"Errore nel salvataggio del file {filename}: {e}")
+            logger.error("Errore nel salvataggio del file %s: %s", filename, e)
+            return None
 
-        # Ricarica e restituisce il contenuto del file JSON
-        return self.load_json(filepath)
+        # Restituisce il contenuto del file decodificando i byte già in memoria, senza rileggerlo dal disco
+        return orjson.loads(encoded)
 
     def load_json(self, filepath):
         """
@@ -71,10 +203,80 @@ class ESGDataFetcher:
         :return: Il contenuto del file JSON.
         """
         try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
+            with open(filepath, 'rb') as f:
+                return orjson.loads(f.read())
+        except Exception as e:
+            logger.error("Errore nel caricamento del file %s: %s", filepath, e)
+            return None
+
+    @staticmethod
+    def _is_fresh(filepath, ttl):
+        """
+        Verifica se un file esiste ed è stato modificato da meno di ttl secondi.
+        """
+        try:
+            return time.time() - os.path.getmtime(filepath) < ttl
+        except OSError:
+            return False
+
+    def _load_cached_json(self, filename):
+        """
+        Restituisce il contenuto di un file JSON salvato in precedenza, se più recente di CACHE_TTL.
+
+        :param filename: Nome del file da cercare nella directory di output.
+        :return: Il contenuto del file, oppure None se il file non esiste o è scaduto.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        if not self._is_fresh(filepath, self.CACHE_TTL):
+            return None
+        return self.load_json(filepath)
+
+    def _load_cached_dataframe(self, filename):
+        """
+        Restituisce un DataFrame salvato in precedenza in Parquet o Feather, se più recente di HISTORY_CACHE_TTL.
+
+        :param filename: Nome del file (.parquet o .feather) da cercare nella directory di output.
+        :return: Il DataFrame letto dal file, oppure None se il file non esiste, è scaduto o non è leggibile.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        if not self._is_fresh(filepath, self.HISTORY_CACHE_TTL):
+            return None
+        try:
+            if filename.endswith(".feather"):
+                frame = pd.read_feather(filepath)
+                return frame.set_index(frame.columns[0])
+            return pd.read_parquet(filepath)
+        except Exception as e:
+            logger.error("Errore nel caricamento del file %s: %s", filepath, e)
+            return None
+
+    def save_dataframe(self, df, filename, file_format="parquet"):
+        """
+        Salva una Series o un DataFrame in formato Parquet (compressione zstd), Feather o JSON.
+        I formati binari sono più compatti e più veloci da rileggere; richiedono colonne con tipi omogenei.
+
+        :param df: Series o DataFrame da salvare.
+        :param filename: Nome del file in cui salvare i dati.
+        :param file_format: 'parquet', 'feather' oppure 'json'.
+        :return: I dati salvati, nella stessa struttura di save_dataframe_to_json, oppure None in caso di errore.
+        """
+        if file_format == "json":
+            return self.save_dataframe_to_json(df, filename)
+
+        filepath = os.path.join(self.output_dir, filename)
+        try:
+            frame = df.to_frame() if isinstance(df, pd.Series) else df
+            if file_format == "parquet":
+                _atomic_write(filepath, lambda path: frame.to_parquet(path, compression='zstd'))
+            elif file_format == "feather":
+                # Feather non memorizza l'indice: viene salvato come prima colonna
+                _atomic_write(filepath, lambda path: frame.reset_index().to_feather(path))
+            else:
+                raise ValueError(f"formato {file_format} non supportato")
+            logger.debug("Dati DataFrame salvati in %s", filepath)
+            return _dataframe_to_payload(df)
         except Exception as e:
-            print(f"Errore nel caricamento del file {filepath}: {e}")
+            logger.error("Errore nel salvataggio del DataFrame %s: %s", filename, e)
             return None
 
     def save_dataframe_to_json(self, df, filename):
@@ -83,16 +285,19 @@ class ESGDataFetcher:
 
         :param df: DataFrame da salvare.
         :param filename: Nome del file in cui salvare i dati.
+        :return: I dati salvati, nella stessa struttura del file JSON, oppure None in caso di errore.
         """
         filepath = os.path.join(self.output_dir, filename)
         try:
-            df.to_json(filepath, orient='columns', indent=4)
-            print(f"Dati DataFrame salvati in {filepath}")
+            # Converte il DataFrame una sola volta e restituisce i dati in memoria, senza rileggere il file
+            payload = _dataframe_to_payload(df)
+            _write_bytes_atomic(filepath, orjson.dumps(payload, default=str,
+                                                       option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+            logger.debug("Dati DataFrame salvati in %s", filepath)
+            return payload
         except Exception as e:
-            print(f"Errore nel salvataggio del DataFrame {filename}: {e}")
-
-        # Ricarica e restituisce il contenuto del file JSON
-        return self.load_json(filepath)
+            logger.error("Errore nel salvataggio del DataFrame %s: %s", filename, e)
+            return None
 
     def get_esg_data(self):
         """
@@ -100,13 +305,17 @@ class ESGDataFetcher:
 
         :return: Il contenuto del file JSON salvato con i dati ESG.
         """
+        cached = self._load_cached_json(f"{self.ticker}_esg_data.json")
+        if cached is not None:
+            return cached
+
         try:
             esg_data = self.company.sustainability
             if esg_data is not None and not esg_data.empty:
                 return self.save_dataframe_to_json(esg_data, f"{self.ticker}_esg_data.json")
             else:
                 return "Dati ESG non disponibili per questo ticker."
-        except Exception as e:
+        except _FETCH_ERRORS as e:
             return f"Errore nel recupero dei dati ESG: {e}"
 
     def get_company_info(self):
@@ -115,10 +324,14 @@ class ESGDataFetcher:
 
         :return: Il contenuto del file JSON salvato con le informazioni aziendali.
         """
+        cached = self._load_cached_json(f"{self.ticker}_company_info.json")
+        if cached is not None:
+            return cached
+
         try:
             info = self.company.info
             return self.save_json(info, f"{self.ticker}_company_info.json")
-        except Exception as e:
+        except _FETCH_ERRORS as e:
             return f"Errore nel recupero delle informazioni aziendali: {e}"
 
     def get_financials(self, year="latest"):
@@ -128,70 +341,198 @@ class ESGDataFetcher:
         :param year: L'anno da filtrare, default 'latest' per ottenere i dati più recenti.
         :return: Un dizionario contenente i contenuti dei file JSON salvati con bilanci, conto economico e flussi di cassa.
         """
+        statements = {
+            "bilancio": "balance_sheet",
+            "conto_economico": "financials",
+            "flussi_di_cassa": "cashflow"
+        }
+
+        def fetch_and_save(key, attribute):
+            value = self._filter_by_year(self._years_map(getattr(self.company, attribute)), year)
+            return self.save_dataframe_to_json(value, f"{self.ticker}_{key}.json")
+
         try:
-            financials = {
-                "bilancio": self._filter_by_year(self.company.balance_sheet, year),
-                "conto_economico": self._filter_by_year(self.company.financials, year),
-                "flussi_di_cassa": self._filter_by_year(self.company.cashflow, year)
-            }
-            json_financials = {}
-            for key, value in financials.items():
-                if True: #isinstance(value, pd.DataFrame):
-                    json_financials[key] = self.save_dataframe_to_json(value, f"{self.ticker}_{key}.json")
+            # I tre prospetti sono richieste indipendenti: scaricati e salvati in parallelo
+            with ThreadPoolExecutor(max_workers=len(statements)) as executor:
+                futures = {key: executor.submit(fetch_and_save, key, attribute) for key, attribute in statements.items()}
+                json_financials = {key: future.result() for key, future in futures.items()}
             return json_financials
-        except Exception as e:
+        except _FETCH_ERRORS as e:
             return f"Errore nel recupero dei dati finanziari: {e}"
 
-    def _filter_by_year(self, dataframe, year):
+    @staticmethod
+    def _years_map(dataframe):
         """
-        Filtra un DataFrame per l'anno più recente o un anno specifico.
+        Associa l'anno di ogni colonna di un DataFrame di bilancio alla colonna stessa,
+        mantenendo l'ordine delle colonne (dalla più recente). A parità di anno prevale la colonna più recente.
 
-        :param dataframe: Il DataFrame da filtrare.
-        :param year: L'anno da filtrare, 'latest' per ottenere l'anno più recente.
-        :return: Un DataFrame filtrato per l'anno specificato.
+        :param dataframe: Il DataFrame con una colonna per data di chiusura.
+        :return: Un dizionario anno (stringa) -> colonna, vuoto se il DataFrame non è disponibile.
         """
         if dataframe is None or dataframe.empty:
+            return {}
+        years_map = {}
+        for position, column in enumerate(dataframe.columns):
+            years_map.setdefault(str(getattr(column, 'year', column)), dataframe.iloc[:, position])
+        return years_map
+
+    def _filter_by_year(self, years_map, year):
+        """
+        Seleziona la colonna dell'anno più recente o di un anno specifico.
+
+        :param years_map: Dizionario anno -> colonna, come restituito da _years_map.
+        :param year: L'anno da filtrare, 'latest' per ottenere l'anno più recente.
+        :return: La colonna dell'anno specificato, oppure un messaggio se non disponibile.
+        """
+        if not years_map:
             return "Dati non disponibili"
 
         if year == "latest":
-            return dataframe.iloc[:, 0]  # Restituisce la colonna più recente
-        else:
-            try:
-                return dataframe[year]
-            except KeyError:
-                return f"Anno {year} non trovato nei dati finanziari."
+            return next(iter(years_map.values()))  # Restituisce la colonna più recente
+        column = years_map.get(str(year))
+        if column is None:
+            return f"Anno {year} non trovato nei dati finanziari."
+        return column
 
     def get_dividends(self):
         """
-        Ottiene la storia dei dividendi dell'azienda e salva in JSON.
+        Ottiene la storia dei dividendi dell'azienda e la salva in Parquet, riutilizzando il file se recente.
 
-        :return: Il contenuto del file JSON salvato con la storia dei dividendi.
+        :return: La storia dei dividendi, nella stessa struttura di save_dataframe_to_json.
         """
+        filename = f"{self.ticker}_dividends.parquet"
+        cached = self._load_cached_dataframe(filename)
+        if cached is not None:
+            return _dataframe_to_payload(cached.iloc[:, 0])
+
         try:
             dividends = self.company.dividends
-            if not dividends.empty:
-                return self.save_dataframe_to_json(dividends, f"{self.ticker}_dividends.json")
+            if dividends is not None and not dividends.empty:
+                return self.save_dataframe(dividends, filename)
             else:
                 return "Nessun dividendo disponibile per questo ticker."
-        except Exception as e:
+        except _FETCH_ERRORS as e:
             return f"Errore nel recupero della storia dei dividendi: {e}"
 
     def get_stock_history(self, period="1y"):
         """
-        Ottiene la storia dei prezzi delle azioni dell'azienda e salva in JSON.
+        Ottiene la storia dei prezzi delle azioni dell'azienda e la salva in Parquet, riutilizzando il file se recente.
 
         :param period: Periodo di tempo per la storia dei prezzi, ad esempio '1y', '5y', 'max'.
-        :return: Il contenuto del file JSON salvato con la storia dei prezzi delle azioni.
+        :return: La storia dei prezzi delle azioni, nella stessa struttura di save_dataframe_to_json.
         """
+        filename = f"{self.ticker}_stock_history_{period}.parquet"
+        cached = self._load_cached_dataframe(filename)
+        if cached is not None:
+            return _dataframe_to_payload(cached)
+
         try:
             stock_history = self.company.history(period=period)
-            if not stock_history.empty:
-                return self.save_dataframe_to_json(stock_history, f"{self.ticker}_stock_history.json")
+            if stock_history is not None and not stock_history.empty:
+                return self.save_dataframe(stock_history, filename)
             else:
                 return f"Nessun dato di prezzi per il periodo specificato: {period}."
-        except Exception as e:
+        except _FETCH_ERRORS as e:
             return f"Errore nel recupero della storia dei prezzi: {e}"
 
+    @classmethod
+    def bulk_stock_history(cls, tickers, period="1y", output_dir="output", chunk_size=20):
+        """
+        Ottiene la storia dei prezzi di più ticker con una sola richiesta yf.download ogni chunk_size simboli,
+        invece di una richiesta per ticker. Usa gli stessi file Parquet di get_stock_history: i ticker con un file
+        recente vengono letti dal disco e solo gli altri vengono scaricati.
+
+        :param tickers: Lista di simboli azionari.
+        :param period: Periodo di tempo per la storia dei prezzi, ad esempio '1y', '5y', 'max'.
+        :param output_dir: Directory in cui salvare i file.
+        :param chunk_size: Numero massimo di simboli per richiesta (default 20).
+        :return: Un dizionario ticker -> storia dei prezzi (o messaggio se non disponibile).
+        """
+        fetchers = {ticker: cls(ticker, output_dir=output_dir) for ticker in tickers}
+
+        results = {}
+        missing = []
+        for ticker, fetcher in fetchers.items():
+            cached = fetcher._load_cached_dataframe(f"{ticker}_stock_history_{period}.parquet")
+            if cached is not None:
+                results[ticker] = _dataframe_to_payload(cached)
+            else:
+                missing.append(ticker)
+
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            try:
+                # ignore_tz=False: le date restano istanti reali (in UTC con più ticker), convertiti poi nel fuso
+                # della borsa come in Ticker.history
+                data = yf.download(" ".join(chunk), period=period, group_by='ticker', auto_adjust=True,
+                                   actions=True, threads=True, ignore_tz=False, progress=False,
+                                   session=cls._get_session())
+            except Exception as e:
+                for ticker in chunk:
+                    results[ticker] = f"Errore nel recupero della storia dei prezzi: {e}"
+                continue
+
+            for ticker in chunk:
+                # yfinance scarica i simboli in maiuscolo
+                symbol = ticker.upper()
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        results[ticker] = f"Nessun dato di prezzi per il periodo specificato: {period}."
+                        continue
+                    stock_history = data[symbol]
+                else:
+                    stock_history = data
+                # Le date degli altri ticker del chunk compaiono come righe vuote
+                stock_history = stock_history.dropna(how='all')
+                if stock_history.empty:
+                    results[ticker] = f"Nessun dato di prezzi per il periodo specificato: {period}."
+                    continue
+
+                fetcher = fetchers[ticker]
+                # Un fuso orario mancante o non valido per un simbolo non deve interrompere il chunk:
+                # in tal caso le date restano in UTC
+                try:
+                    tz = fetcher.company.fast_info["timezone"]
+                    if tz is not None and stock_history.index.tz is not None:
+                        stock_history = stock_history.tz_convert(tz)
+                except Exception as e:
+                    logger.debug("Fuso orario non disponibile per %s: %s", ticker, e)
+                results[ticker] = fetcher.save_dataframe(stock_history, f"{ticker}_stock_history_{period}.parquet")
+
+        return {ticker: results[ticker] for ticker in fetchers}
+
+
+# Protegge la creazione dei fetcher condivisi, così ogni ticker viene inizializzato una sola volta
+_FETCHERS_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def _create_fetcher(ticker: str, period: int) -> ESGDataFetcher:
+    return ESGDataFetcher(ticker)
+
+
+def _get_fetcher(ticker: str) -> ESGDataFetcher:
+    """
+    Restituisce l'ESGDataFetcher condiviso per il ticker indicato, creandolo alla prima richiesta.
+    Come per gli yf.Ticker, il fetcher viene ricreato a ogni nuovo intervallo di CACHE_TTL.
+    """
+    with _FETCHERS_LOCK:
+        return _create_fetcher(ticker, ESGDataFetcher._cache_period())
+
+
+# Metodo di ESGDataFetcher da chiamare per ogni data_id
+_DISPATCH: Dict[str, str] = {
+    "esg_data": "get_esg_data",
+    "company_data": "get_company_info",
+    "financials_data": "get_financials",
+    "dividends_data": "get_dividends",
+    "dividends_history": "get_dividends",
+    "stock_history": "get_stock_history",
+}
+
+# data_id accettati da generate_data
+_ALLOWED = frozenset(_DISPATCH)
+
 
 # Esempio di utilizzo dell'SDK
 def generate_data(request: GenerateDataRequest):
@@ -200,15 +541,16 @@ def generate_data(request: GenerateDataRequest):
     data_id = request.data_id
     data_params = request.data_params
 
-    esg_fetcher = ESGDataFetcher(ticker)
+    if data_id not in _ALLOWED:
+        raise InvalidRequestError(f"data_id non valido: {data_id}. Valori ammessi: {', '.join(sorted(_ALLOWED))}.")
+
+    # Più ticker in un'unica richiesta: la storia dei prezzi viene scaricata in blocco
+    if isinstance(ticker, list):
+        if data_id != "stock_history":
+            raise InvalidRequestError("Una lista di ticker è supportata solo per data_id 'stock_history'.")
+        return ESGDataFetcher.bulk_stock_history(ticker, **data_params)
 
-    getters = {
-        "esg_data": esg_fetcher.get_esg_data,
-        "company_data": esg_fetcher.get_company_info,
-        "financials_data": esg_fetcher.get_financials,
-        "dividends_history": esg_fetcher.get_dividends,
-        "stock_history": esg_fetcher.get_stock_history,
-    }
+    esg_fetcher = _get_fetcher(ticker)
 
     '''
     # Ottieni i dati ESG
@@ -234,63 +576,82 @@ def generate_data(request: GenerateDataRequest):
         "stock_history": stock_history,
     }'''
 
-    output_data = getters[data_id](**data_params)
+    output_data = getattr(esg_fetcher, _DISPATCH[data_id])(**data_params)
 
     return output_data
 
 
-def get_tickers(file_path: str) -> List[Dict[str, str]]:
+@lru_cache(maxsize=8)
+def _load_tickers(file_path: str, mtime: float) -> List[Dict[str, str]]:
     """
-    Estrae i ticker, nome dell'azienda, settore e market cap da un file JSON.
-
-    :param file_path: Percorso del file JSON che contiene i dati aziendali.
-    :return: Una lista di dizionari contenenti 'ticker', 'company_name', 'sector' e 'market_cap'.
+    Legge il file JSON dei ticker ed estrae i campi richiesti. Il risultato è memorizzato per (percorso, mtime),
+    quindi il file viene riletto solo quando cambia; la lista restituita è condivisa e non va modificata.
     """
-    try:
-        # Leggi il file JSON e carica i dati
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-
-        # Estrai i campi ticker, company_name, sector e market_cap
-        extracted_data = [
+    # Legge il file JSON un elemento alla volta, senza caricarlo tutto in memoria,
+    # ed estrae i campi ticker, company_name, sector e market_cap
+    with open(file_path, 'rb') as f:
+        return [
             {
                 'ticker': item.get('ticker', 'N/A'),
                 'company_name': item.get('company_name', 'N/A'),
                 'sector': item.get('sector', 'N/A'),
                 'market_cap': item.get('market_cap', 'N/A')
             }
-            for item in data if 'ticker' in item
+            for item in ijson.items(f, 'item', use_float=True) if 'ticker' in item
         ]
 
-        return extracted_data
+
+def get_tickers(file_path: str) -> List[Dict[str, str]]:
+    """
+    Estrae i ticker, nome dell'azienda, settore e market cap da un file JSON.
+
+    :param file_path: Percorso del file JSON che contiene i dati aziendali.
+    :return: Una lista di dizionari contenenti 'ticker', 'company_name', 'sector' e 'market_cap'.
+    """
+    try:
+        return _load_tickers(file_path, os.path.getmtime(file_path))
 
     except FileNotFoundError:
-        print(f"Errore: File non trovato - {file_path}")
+        logger.error("Errore: File non trovato - %s", file_path)
         return []
 
-    except json.JSONDecodeError:
-        print(f"Errore: Formato JSON non valido - {file_path}")
+    except ijson.JSONError:
+        logger.error("Errore: Formato JSON non valido - %s", file_path)
         return []
 
     except Exception as e:
-        print(f"Errore imprevisto durante l'estrazione dei dati: {e}")
+        logger.error("Errore imprevisto durante l'estrazione dei dati: %s", e)
         return []
 
 
 # Test con selezione casuale di ticker
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     # Carica i ticker da un file JSON
     ticker_file_path = 'tickers_data.json'  # Assumi che questo sia il file JSON che contiene i ticker
-    with open(ticker_file_path, 'r') as f:
-        tickers_data = json.load(f)
+    with open(ticker_file_path, 'rb') as f:
+        tickers_data = orjson.loads(f.read())
 
     # Estrai i ticker e seleziona un numero casuale di ticker per il test
     tickers = [item['ticker'] for item in tickers_data]
     random_tickers = random.sample(tickers, 5)  # Seleziona 5 ticker a caso
 
-    # Testa la funzione get_stock_history per ciascun ticker selezionato
-    for ticker in random_tickers:
-        print(f"\n\nTest per il ticker: {ticker}")
-        request = GenerateDataRequest(ticker=ticker, data_id="financials_data", data_params={})
-        stock_history = generate_data(request)
-        print(json.dumps(stock_history, indent=2))
+    # Testa la funzione generate_data per i ticker selezionati, in parallelo (le richieste sono I/O-bound)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {
+            ticker: executor.submit(generate_data, GenerateDataRequest(ticker=ticker, data_id="financials_data",
+                                                                       data_params={}))
+            for ticker in random_tickers
+        }
+        for ticker, future in futures.items():
+            print(f"\n\nTest per il ticker: {ticker}")
+            try:
+                financials = future.result(timeout=60)
+            except FuturesTimeoutError:
+                print(f"Timeout nel recupero dei dati per {ticker}")
+                continue
+            except (requests.HTTPError, KeyError) as e:
+                print(f"Errore nel recupero dei dati per {ticker}: {e}")
+                continue
+            print(orjson.dumps(financials, default=str, option=orjson.OPT_INDENT_2).decode())